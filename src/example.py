@@ -2,15 +2,14 @@
 Simple F1 pit stop timing optimizer with ML-based pit window predictions.
 """
 import argparse
-import fastf1
-import os
-from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS
+import sys
+from bisect import bisect_right
+from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS, TRACK_DATA, TRACK_NAME_LOOKUP, evolution_bonus
+from pitstop_analyzer import load_session
 from dataclasses import dataclass
 
-# Configure FastF1 cache
-if not os.path.exists('cache'):
-    os.makedirs('cache')
-fastf1.Cache.enable_cache('cache')
+# Shared predictor, reused across analyses instead of rebuilt per call
+PREDICTOR = TrackPredictor()
 
 # Tire compounds based on historical data
 TIRE_COMPOUNDS = {
@@ -37,6 +36,10 @@ TIRE_COMPOUNDS = {
     }
 }
 
+# Degradation levels at which risk rises to MEDIUM, HIGH and CRITICAL
+RISK_THRESHOLDS = (0.5, 0.75, 0.9)
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
 # Fuel effect parameters
 FUEL_EFFECTS = {
     'initial_multiplier': 1.4,  # Maximum effect at race start
@@ -44,67 +47,56 @@ FUEL_EFFECTS = {
     'min_multiplier': 1.0      # Minimum effect at end of race
 }
 
-def get_user_input():
-    """Get current race situation from user."""
-    print("\nEnter current race situation:")
-    
-    while True:
-        track_name = input("Track name (Monza/Spa/Silverstone): ").strip().capitalize()
-        if track_name in TRACK_CHARACTERISTICS:
-            break
-        print("Please enter a valid track name")
-    
-    total_laps = TRACK_CHARACTERISTICS[track_name]['total_laps']
+def _prompt(prompt: str, parse, is_valid, range_msg: str, error_msg: str, input_fn, print_fn):
+    """Prompt until the parsed answer passes validation."""
     while True:
         try:
-            current_lap = int(input(f"Current lap number (1-{total_laps}): "))
-            if 0 < current_lap <= total_laps:
-                break
-            print(f"Current lap must be between 1 and {total_laps}")
+            value = parse(input_fn(prompt))
         except ValueError:
-            print("Please enter valid numbers")
-    
-    while True:
-        try:
-            position = int(input("Current position: "))
-            if 1 <= position <= 20:
-                break
-            print("Position must be between 1 and 20")
-        except ValueError:
-            print("Please enter a valid position")
-    
-    while True:
-        try:
-            gap_ahead = float(input("Gap to car ahead (seconds, -1 if none): "))
-            if gap_ahead >= -1:
-                break
-            print("Gap must be >= -1")
-        except ValueError:
-            print("Please enter a valid gap")
+            print_fn(error_msg)
+            continue
+        if is_valid(value):
+            return value
+        print_fn(range_msg)
+
+def get_user_input(input_fn=None, print_fn=None):
+    """Get current race situation from user.
     
-    while True:
-        try:
-            gap_behind = float(input("Gap to car behind (seconds, -1 if none): "))
-            if gap_behind >= -1:
-                break
-            print("Gap must be >= -1")
-        except ValueError:
-            print("Please enter a valid gap")
+    input_fn and print_fn replace the builtin input() and print(), so answers
+    can be fed from an iterator for scripted or batch runs without a terminal.
+    Both are resolved at call time, so patching the builtins also works.
+    """
+    input_fn = input_fn or input
+    print_fn = print_fn or print
+    print_fn("\nEnter current race situation:")
     
-    while True:
-        compound = input("Current tire compound (SOFT/MEDIUM/HARD): ").strip().upper()
-        if compound in TIRE_COMPOUNDS:
-            break
-        print("Please enter a valid tire compound")
+    track_name = _prompt("Track name (Monza/Spa/Silverstone): ",
+                         lambda s: TRACK_NAME_LOOKUP.get(s.strip().lower()),
+                         lambda v: v is not None,
+                         "Please enter a valid track name", "Please enter a valid track name",
+                         input_fn=input_fn, print_fn=print_fn)
     
-    while True:
-        try:
-            tire_age = int(input("Current tire age (laps): "))
-            if tire_age >= 0:
-                break
-            print("Tire age must be 0 or positive")
-        except ValueError:
-            print("Please enter a valid number")
+    total_laps = TRACK_CHARACTERISTICS[track_name]['total_laps']
+    current_lap = _prompt(f"Current lap number (1-{total_laps}): ", int,
+                          lambda v: 0 < v <= total_laps,
+                          f"Current lap must be between 1 and {total_laps}", "Please enter valid numbers",
+                          input_fn=input_fn, print_fn=print_fn)
+    position = _prompt("Current position: ", int, lambda v: 1 <= v <= 20,
+                       "Position must be between 1 and 20", "Please enter a valid position",
+                       input_fn=input_fn, print_fn=print_fn)
+    gap_ahead = _prompt("Gap to car ahead (seconds, -1 if none): ", float, lambda v: v >= -1,
+                        "Gap must be >= -1", "Please enter a valid gap",
+                        input_fn=input_fn, print_fn=print_fn)
+    gap_behind = _prompt("Gap to car behind (seconds, -1 if none): ", float, lambda v: v >= -1,
+                         "Gap must be >= -1", "Please enter a valid gap",
+                         input_fn=input_fn, print_fn=print_fn)
+    compound = _prompt("Current tire compound (SOFT/MEDIUM/HARD): ", lambda s: s.strip().upper(),
+                       lambda v: v in TIRE_COMPOUNDS,
+                       "Please enter a valid tire compound", "Please enter a valid tire compound",
+                       input_fn=input_fn, print_fn=print_fn)
+    tire_age = _prompt("Current tire age (laps): ", int, lambda v: v >= 0,
+                       "Tire age must be 0 or positive", "Please enter a valid number",
+                       input_fn=input_fn, print_fn=print_fn)
     
     return {
         'track_name': track_name,
@@ -123,14 +115,6 @@ def calculate_fuel_effect(current_lap: int, total_laps: int) -> float:
             (1 - race_progress) ** (FUEL_EFFECTS['decay_rate'] * total_laps)
     return FUEL_EFFECTS['min_multiplier'] + effect
 
-def calculate_evolution_bonus(track_type: str, track_evolution: float) -> int:
-    """Calculate lap bonus based on track evolution."""
-    if track_evolution >= 0.09:
-        return 3  # High evolution bonus (e.g. Spa)
-    elif track_evolution >= 0.08:
-        return 2  # Medium evolution bonus (e.g. Monza)
-    return 1     # Low evolution bonus (e.g. Silverstone)
-
 def calculate_degradation_level(tire_age: int, max_life: int, fuel_effect: float) -> float:
     """Calculate tire degradation level (0-1 scale) with fuel effect."""
     base_deg = min(1.0, tire_age / max_life)
@@ -138,21 +122,24 @@ def calculate_degradation_level(tire_age: int, max_life: int, fuel_effect: float
 
 def get_risk_assessment(deg_level: float) -> str:
     """Get risk assessment based on degradation level."""
-    if deg_level >= 0.9:
-        return "CRITICAL"
-    elif deg_level >= 0.75:
-        return "HIGH"
-    elif deg_level >= 0.5:
-        return "MEDIUM"
-    return "LOW"
+    return RISK_LEVELS[bisect_right(RISK_THRESHOLDS, deg_level)]
 
-def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus, risk, pit_window):
-    """Get detailed strategy recommendation based on track characteristics."""
-    remaining_race = track_data.total_laps - race_info['current_lap']
+def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus, risk, pit_window,
+                                fuel_effect=None, remaining_race=None):
+    """Get detailed strategy recommendation based on track characteristics.
+    
+    fuel_effect and remaining_race are computed from the race state when not
+    passed in; analyze_pit_window passes the values it already has.
+    """
+    current_lap = race_info['current_lap']
+    if fuel_effect is None:
+        fuel_effect = calculate_fuel_effect(current_lap, track_data.total_laps)
+    if remaining_race is None:
+        remaining_race = track_data.total_laps - current_lap
     recommendations = []
     
     # Early race strategy (first 10 laps)
-    if race_info['current_lap'] < 10:
+    if current_lap < 10:
         if track_data.track_evolution >= 0.08:
             recommendations.extend([
                 "MEDIUM tires recommended for longer first stint",
@@ -167,7 +154,6 @@ def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus
             ])
         
         # Add fuel effect consideration
-        fuel_effect = calculate_fuel_effect(race_info['current_lap'], track_data.total_laps)
         if fuel_effect > 1.2:
             recommendations.append(f"High fuel load effect (+{(fuel_effect-1)*100:.1f}% deg)")
     
@@ -209,9 +195,9 @@ def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus
     
     # Add ML-based pit window recommendation
     window_start, window_end = pit_window
-    if window_start <= race_info['current_lap'] <= window_end:
+    if window_start <= current_lap <= window_end:
         recommendations.append("Currently in optimal pit window")
-        if race_info['gap_ahead'] < 3 and race_info['gap_ahead'] > 0:
+        if 0 < race_info['gap_ahead'] < 3:
             if track_data.overtaking_diff < 0.4:
                 recommendations.append("Undercut viable with good overtaking potential")
             else:
@@ -221,8 +207,8 @@ def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus
                 recommendations.append("Overcut preferred due to difficult overtaking")
             else:
                 recommendations.append("Defend position, prepare for overcut if needed")
-    elif race_info['current_lap'] < window_start:
-        recommendations.append(f"Optimal pit window in {window_start - race_info['current_lap']} laps")
+    elif current_lap < window_start:
+        recommendations.append(f"Optimal pit window in {window_start - current_lap} laps")
     
     # Add risk-based recommendations
     if risk in ["HIGH", "CRITICAL"]:
@@ -233,12 +219,17 @@ def get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus
     
     return recommendations
 
-def get_live_track_data(track_name):
+# Track data derived from live sessions, keyed by track name
+_LIVE_TRACK_DATA = {}
+
+def get_live_track_data(track_name, print_fn=None):
     """Get real-time track data using FastF1."""
+    if track_name in _LIVE_TRACK_DATA:
+        return _LIVE_TRACK_DATA[track_name]
+    
     try:
         # Get latest session for the track
-        session = fastf1.get_session(2024, track_name, 'R')
-        session.load()
+        session = load_session(2024, track_name, 'R')
         
         # Extract track characteristics from live data
         track_data = TRACK_CHARACTERISTICS[track_name].copy()
@@ -251,32 +242,40 @@ def get_live_track_data(track_name):
             if track_evolution is not None:
                 track_data['track_evolution'] = min(0.09, max(0.07, track_evolution))
         
-        return TrackPredictor().predict_from_characteristics(track_data)
+        live_data = PREDICTOR.predict_from_characteristics(track_data)
+        _LIVE_TRACK_DATA[track_name] = live_data
+        return live_data
         
     except Exception as e:
-        print(f"\nWarning: Could not fetch live data ({str(e)})")
-        print("Falling back to cached track characteristics")
-        return TrackPredictor().predict_from_characteristics(TRACK_CHARACTERISTICS[track_name])
+        print_fn = print_fn or print
+        print_fn(f"\nWarning: Could not fetch live data ({str(e)})")
+        print_fn("Falling back to cached track characteristics")
+        return TRACK_DATA[track_name]
 
-def analyze_pit_window(track_data, race_info):
-    """Analyze optimal pit window based on current situation."""
+def _write_line(text: str):
+    """Write text plus a newline to stdout in a single call."""
+    sys.stdout.write(text + "\n")
+
+def analyze_pit_window(track_data, race_info, print_fn=None):
+    """Analyze optimal pit window based on current situation.
+    
+    The report is passed to print_fn as one string; by default it is written
+    to stdout in a single call.
+    """
     # Get compound characteristics
     compound_data = TIRE_COMPOUNDS[race_info['compound']]
     base_life = compound_data['max_life']
-    warning_age = compound_data['warning_age']
-    deg_rate = compound_data['deg_rate']
     
     # Calculate evolution bonus and fuel effect
-    evo_bonus = calculate_evolution_bonus(track_data.track_type, track_data.track_evolution)
+    evo_bonus = evolution_bonus(track_data.track_evolution)
     fuel_effect = calculate_fuel_effect(race_info['current_lap'], track_data.total_laps)
     
     # Apply track-specific degradation factor and fuel effect
     adjusted_life = int(base_life * (1 / track_data.tire_deg_factor)) + evo_bonus
-    warning_lap = int(warning_age * (1 / track_data.tire_deg_factor)) + evo_bonus
     
     # Calculate current tire state
+    remaining_race = track_data.total_laps - race_info['current_lap']
     remaining_life = adjusted_life - race_info['tire_age']
-    laps_to_warning = warning_lap - race_info['tire_age']
     deg_level = calculate_degradation_level(race_info['tire_age'], adjusted_life, fuel_effect)
     risk = get_risk_assessment(deg_level)
     
@@ -290,96 +289,128 @@ def analyze_pit_window(track_data, race_info):
         'tire_age': race_info['tire_age'],
         'compound': race_info['compound']
     }
-    pit_window = TrackPredictor().predict_pit_window(race_data)
+    pit_window = PREDICTOR.predict_pit_window(race_data)
     
-    print("\nRace Situation Analysis:")
-    print("=" * 50)
-    print(f"Track: {race_info['track_name']} ({track_data.total_laps} laps)")
-    print(f"Track Type: {track_data.track_type}")
-    print(f"Position: P{race_info['current_position']}")
+    report = [
+        "\nRace Situation Analysis:",
+        "=" * 50,
+        f"Track: {race_info['track_name']} ({track_data.total_laps} laps)",
+        f"Track Type: {track_data.track_type}",
+        f"Position: P{race_info['current_position']}",
+    ]
     if race_info['gap_ahead'] > 0:
-        print(f"Gap Ahead: {race_info['gap_ahead']:.1f}s")
+        report.append(f"Gap Ahead: {race_info['gap_ahead']:.1f}s")
     if race_info['gap_behind'] > 0:
-        print(f"Gap Behind: {race_info['gap_behind']:.1f}s")
-    
-    print("\nTrack Characteristics:")
-    print("-" * 50)
-    print(f"Tire Degradation Factor: {track_data.tire_deg_factor:.2f}")
-    print(f"Track Evolution Rate: {track_data.track_evolution:.3f}")
-    print(f"Evolution Bonus: +{evo_bonus} laps")
-    print(f"Overtaking Difficulty: {track_data.overtaking_diff:.2f}")
-    print(f"Safety Car Probability: {track_data.safety_car_prob:.0%}")
+        report.append(f"Gap Behind: {race_info['gap_behind']:.1f}s")
     
-    print("\nTire Analysis:")
-    print("-" * 50)
-    print(f"Current Lap: {race_info['current_lap']}/{track_data.total_laps}")
-    print(f"Compound: {race_info['compound']}")
-    print(f"Current Tire Age: {race_info['tire_age']} laps")
-    print(f"Base Tire Life: {base_life} laps")
-    print(f"Adjusted Life (with track factor): {adjusted_life} laps")
-    print(f"Remaining Life: {max(0, remaining_life)} laps")
-    print(f"Fuel Effect: +{(fuel_effect-1)*100:.1f}% degradation")
-    print(f"Degradation Level: {deg_level:.2%}")
-    print(f"Risk Assessment: {risk}")
+    report += [
+        "\nTrack Characteristics:",
+        "-" * 50,
+        f"Tire Degradation Factor: {track_data.tire_deg_factor:.2f}",
+        f"Track Evolution Rate: {track_data.track_evolution:.3f}",
+        f"Evolution Bonus: +{evo_bonus} laps",
+        f"Overtaking Difficulty: {track_data.overtaking_diff:.2f}",
+        f"Safety Car Probability: {track_data.safety_car_prob:.0%}",
+        "\nTire Analysis:",
+        "-" * 50,
+        f"Current Lap: {race_info['current_lap']}/{track_data.total_laps}",
+        f"Compound: {race_info['compound']}",
+        f"Current Tire Age: {race_info['tire_age']} laps",
+        f"Base Tire Life: {base_life} laps",
+        f"Adjusted Life (with track factor): {adjusted_life} laps",
+        f"Remaining Life: {max(0, remaining_life)} laps",
+        f"Fuel Effect: +{(fuel_effect-1)*100:.1f}% degradation",
+        f"Degradation Level: {deg_level:.2%}",
+        f"Risk Assessment: {risk}",
+    ]
     
     # Determine pit window
     if risk == "CRITICAL":
-        print("\nCRITICAL: Tires are at critical wear level!")
-        print("Recommend pitting immediately")
+        report += ["\nCRITICAL: Tires are at critical wear level!", "Recommend pitting immediately"]
     elif risk == "HIGH":
-        print("\nWARNING: Tires are in high wear phase")
-        print("Recommend pitting in next 1-2 laps")
+        report += ["\nWARNING: Tires are in high wear phase", "Recommend pitting in next 1-2 laps"]
     else:
-        print(f"\nML-Predicted Pit Window: Lap {pit_window[0]}-{pit_window[1]}")
+        report.append(f"\nML-Predicted Pit Window: Lap {pit_window.start}-{pit_window.end}")
     
     # Get and display strategy recommendations
-    recommendations = get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus, risk, pit_window)
-    print("\nStrategy Recommendations:")
-    print("-" * 50)
-    for rec in recommendations:
-        print(f"- {rec}")
+    recommendations = get_strategy_recommendation(track_data, race_info, remaining_life, evo_bonus, risk, pit_window,
+                                                  fuel_effect, remaining_race)
+    report += ["\nStrategy Recommendations:", "-" * 50]
+    report += [f"- {rec}" for rec in recommendations]
     
     # Add final pit window recommendation
-    remaining_race = track_data.total_laps - race_info['current_lap']
     if remaining_race <= remaining_life:
-        print("\nPit Window Status: No pit stop needed")
-        print(f"Current {race_info['compound']} tires sufficient to finish the race")
+        report += ["\nPit Window Status: No pit stop needed",
+                   f"Current {race_info['compound']} tires sufficient to finish the race"]
     elif risk == "CRITICAL":
-        print("\nPit Window Status: CRITICAL - Box this lap")
+        report.append("\nPit Window Status: CRITICAL - Box this lap")
     elif risk == "HIGH":
-        print("\nPit Window Status: HIGH RISK - Box within 2 laps")
+        report.append("\nPit Window Status: HIGH RISK - Box within 2 laps")
     else:
-        print(f"\nPit Window Status: Next window Lap {pit_window[0]}-{pit_window[1]}")
+        report.append(f"\nPit Window Status: Next window Lap {pit_window.start}-{pit_window.end}")
+    
+    # Emit the whole report in a single write
+    (print_fn or _write_line)("\n".join(report))
+
+# get_user_input's answers in prompt order, as keyed in run_batch queries
+INPUT_FIELDS = ('track_name', 'current_lap', 'current_position', 'gap_ahead', 'gap_behind', 'compound', 'tire_age')
 
-def main():
-    """Run pit stop analysis with ML-based optimization."""
+def run_batch(queries, print_fn=None):
+    """
+    Analyze several race situations without a terminal.
+    
+    Each query maps INPUT_FIELDS to the answers get_user_input would read, and
+    goes through the same validation; a query with an invalid answer raises
+    ValueError. Cached track characteristics are used.
+    
+    Returns:
+        List of validated race_info dictionaries, one per query
+    """
+    results = []
+    for query in queries:
+        answers = iter([str(query[field]) for field in INPUT_FIELDS])
+        try:
+            race_info = get_user_input(input_fn=lambda _: next(answers), print_fn=print_fn)
+        except StopIteration:
+            raise ValueError(f"Invalid race situation: {query}") from None
+        analyze_pit_window(TRACK_DATA[race_info['track_name']], race_info, print_fn)
+        results.append(race_info)
+    return results
+
+def main(input_fn=None, print_fn=None):
+    """Run pit stop analysis with ML-based optimization.
+    
+    input_fn and print_fn are passed to every prompt and report, as in
+    get_user_input; by default the builtins are used.
+    """
     parser = argparse.ArgumentParser(description='F1 Pit Stop Optimizer')
     parser.add_argument('--live-data', action='store_true', help='Use live session data instead of cached characteristics')
     args = parser.parse_args()
     
-    print("\nF1 Pit Stop Optimizer")
-    print("=" * 50)
-    print("Enhanced with fuel effect and track-specific tire modeling")
+    input_fn = input_fn or input
+    say = print_fn or print
+    say("\nF1 Pit Stop Optimizer")
+    say("=" * 50)
+    say("Enhanced with fuel effect and track-specific tire modeling")
     
     while True:
         # Get user input
-        race_info = get_user_input()
+        race_info = get_user_input(input_fn, print_fn)
         track_name = race_info['track_name']
         
         # Get track data (live or cached)
         if args.live_data:
-            track_data = get_live_track_data(track_name)
+            track_data = get_live_track_data(track_name, print_fn)
         else:
-            track_data = TrackPredictor().predict_from_characteristics(TRACK_CHARACTERISTICS[track_name])
+            track_data = TRACK_DATA[track_name]
         
         # Analyze pit window
-        analyze_pit_window(track_data, race_info)
+        analyze_pit_window(track_data, race_info, print_fn)
         
-        print("\nAnalyze another situation? (y/n): ", end='')
-        if input().lower() != 'y':
+        if input_fn("\nAnalyze another situation? (y/n): ").lower() != 'y':
             break
     
-    print("\nAnalysis complete!")
+    say("\nAnalysis complete!")
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,11 @@
 """
 Track characteristics model based on 2022-2023 F1 data with ML-based pit window optimization.
 """
+from bisect import bisect_right # Threshold lookups
 from dataclasses import dataclass # Dataclass for track data
-from typing import Dict, List, Tuple 
+from types import MappingProxyType # Read-only view for shared lookup tables
+from typing import Dict, List, NamedTuple
 import numpy as np # Numerical operations
-from sklearn.preprocessing import StandardScaler # Feature scaling for ML model
-from lightgbm import LGBMRegressor # ML model for pit window prediction
 
 # Tire compound characteristics
 TIRE_COMPOUNDS = {
@@ -29,7 +29,13 @@ TIRE_COMPOUNDS = {
     }
 }
 
-@dataclass
+# Compound characteristics as arrays, indexed by COMPOUND_INDEX, for vectorized lookups
+COMPOUND_INDEX = {compound: i for i, compound in enumerate(TIRE_COMPOUNDS)}
+COMPOUND_MAX_LIFE = np.array([info['max_life'] for info in TIRE_COMPOUNDS.values()], dtype=np.float64)
+COMPOUND_GRIP_LEVEL = np.array([info['grip_level'] for info in TIRE_COMPOUNDS.values()], dtype=np.float64)
+COMPOUND_DEG_RATE = np.array([info['deg_rate'] for info in TIRE_COMPOUNDS.values()], dtype=np.float64)
+
+@dataclass(frozen=True, slots=True)
 class TrackData:
     """Track configuration data."""
     tire_deg_factor: float  # Base degradation multiplier
@@ -39,6 +45,11 @@ class TrackData:
     safety_car_prob: float # Safety car probability
     total_laps: int       # Standard race distance in laps
 
+class PitWindow(NamedTuple):
+    """Predicted pit window, inclusive lap range."""
+    start: int  # First lap of the window
+    end: int    # Last lap of the window
+
 # Track characteristics from historical data
 TRACK_CHARACTERISTICS = {
     'Monza': {
@@ -67,6 +78,15 @@ TRACK_CHARACTERISTICS = {
     }
 }
 
+# Case-insensitive track name lookup (lowercase name -> canonical name)
+TRACK_NAME_LOOKUP = MappingProxyType({name.lower(): name for name in TRACK_CHARACTERISTICS})
+
+# Pre-built, read-only track data, constructed once instead of on every lookup
+TRACK_DATA = MappingProxyType({
+    name: TrackData(**characteristics)
+    for name, characteristics in TRACK_CHARACTERISTICS.items()
+})
+
 # Track type characteristics
 TRACK_TYPE_DATA = {
     'Street': {
@@ -89,13 +109,66 @@ TRACK_TYPE_DATA = {
     }
 }
 
+# One-hot (High-speed, Technical, Street) feature encoding by track type
+TRACK_TYPE_ENCODING = {
+    'High-speed': (1.0, 0.0, 0.0),
+    'Technical': (0.0, 1.0, 0.0),
+    'Street': (0.0, 0.0, 1.0)
+}
+
+# Track evolution thresholds for the +2 (e.g. Monza) and +3 (e.g. Spa) lap bonus;
+# anything below gets +1 (e.g. Silverstone)
+EVOLUTION_BONUS_THRESHOLDS = (0.08, 0.09)
+
+def evolution_bonus(track_evolution: float) -> int:
+    """Extra stint laps gained from track evolution."""
+    return 1 + bisect_right(EVOLUTION_BONUS_THRESHOLDS, track_evolution)
+
+# Base pit window size (laps either side of the optimal lap) by track type
+PIT_WINDOW_SIZE = {
+    'High-speed': 4,  # Wider windows due to overtaking opportunities
+    'Technical': 3,   # Balanced window for technical tracks
+    'Street': 2       # Narrow windows due to track position importance
+}
+
+# Pit window size adjustment by tire compound
+COMPOUND_WINDOW_ADJUSTMENT = {
+    'SOFT': -1,  # Narrower window for softs
+    'MEDIUM': 0,
+    'HARD': 1    # Wider window for hards
+}
+# COMPOUND_WINDOW_ADJUSTMENT as an array indexed by COMPOUND_INDEX
+COMPOUND_WINDOW_OFFSET = np.array([COMPOUND_WINDOW_ADJUSTMENT[compound] for compound in TIRE_COMPOUNDS])
+
+# Per-scenario race_data fields stacked into columns for batched prediction
+RACE_FIELDS = ('current_position', 'gap_ahead', 'gap_behind', 'current_lap', 'tire_age')
+
+def compound_indices(compounds: np.ndarray) -> np.ndarray:
+    """Map compound names to COMPOUND_INDEX positions, resolving each distinct name once."""
+    names, inverse = np.unique(compounds, return_inverse=True)
+    return np.array([COMPOUND_INDEX[name] for name in names])[inverse]
+
 class PitWindowPredictor:
     """ML-based predictor for optimal pit windows."""
     
     def __init__(self):
         """Initialize the pit window predictor."""
-        # Initialize the LightGBM Regressor model with predefined hyperparameters
-        self.model = LGBMRegressor(
+        # LightGBM model, built on first training so heuristic-only use
+        # never imports or constructs it
+        self.model = None
+        
+        # Per-feature mean and scale for standardization, set during training
+        self.feature_mean = None
+        self.feature_scale = None
+        
+        # Flag to track whether the model has been trained
+        self.is_trained = False
+    
+    def _build_model(self):
+        """Create the LightGBM Regressor model with predefined hyperparameters."""
+        from lightgbm import LGBMRegressor # ML model for pit window prediction
+        
+        return LGBMRegressor(
             n_estimators=200,        # Number of boosting iterations (trees)
             learning_rate=0.05,      # Conservative learning rate for stability
             max_depth=6,             # Maximum tree depth to control model complexity
@@ -106,16 +179,15 @@ class PitWindowPredictor:
             bagging_freq=5,          # Frequency of applying bagging
             random_state=42          # Ensures reproducibility of results
         )
-        
-        # Initialize a StandardScaler for feature scaling (normalization)
-        self.scaler = StandardScaler()
-        
-        # Flag to track whether the model has been trained
-        self.is_trained = False
 
     
     def prepare_features(self, data: Dict) -> np.ndarray:
         """Prepare features for pit window prediction."""
+        features = np.array(self._feature_row(data), dtype=np.float64).reshape(1, -1)
+        return self._standardize(features) if self.is_trained else features
+    
+    def _feature_row(self, data: Dict) -> List[float]:
+        """Build the raw (unscaled) feature values for one race situation."""
         track_data = data['track_data']
         current_lap = data['current_lap']
         tire_age = data['tire_age']
@@ -152,9 +224,7 @@ class PitWindowPredictor:
             evolution_factor,  # Track evolution effect
             
             # Track type encoding
-            1.0 if track_data.track_type == 'High-speed' else 0.0,
-            1.0 if track_data.track_type == 'Technical' else 0.0,
-            1.0 if track_data.track_type == 'Street' else 0.0,
+            *TRACK_TYPE_ENCODING.get(track_data.track_type, (0.0, 0.0, 0.0)),
             
             # Combined characteristics
             track_data.tire_deg_factor * track_data.track_evolution,
@@ -168,20 +238,121 @@ class PitWindowPredictor:
             1.0 if current_lap > track_data.total_laps * 0.7 else 0.0   # Late race
         ])
         
-        features = np.array(features).reshape(1, -1)
-        return self.scaler.transform(features) if self.is_trained else features
+        return features
+    
+    def _feature_matrix(self, data: Dict) -> np.ndarray:
+        """
+        Build raw (unscaled) features for column-oriented data, one row per sample.
+        
+        Arrays hold one value per sample and scalars are broadcast to every row.
+        Produces the same features as _feature_row, which stays the cheaper path
+        for a single race situation.
+        """
+        track_data = data['track_data']
+        current_lap = np.asarray(data['current_lap'], dtype=np.float64)
+        tire_age = np.asarray(data['tire_age'], dtype=np.float64)
+        compounds = np.atleast_1d(data.get('compound', 'MEDIUM'))  # Default to MEDIUM if not specified
+        n_samples = np.broadcast(
+            np.atleast_1d(data['current_position']), np.atleast_1d(data['gap_ahead']),
+            np.atleast_1d(data['gap_behind']), np.atleast_1d(current_lap),
+            np.atleast_1d(tire_age), compounds
+        ).shape[0]
+        
+        # Get tire compound characteristics, resolving each distinct compound name once
+        compound_idx = compound_indices(compounds)
+        grip_level = COMPOUND_GRIP_LEVEL[compound_idx]
+        deg_rate = COMPOUND_DEG_RATE[compound_idx]
+        max_life = COMPOUND_MAX_LIFE[compound_idx]
+        
+        # Calculate track evolution effect with starting value as 1
+        evolution_factor = 1.0 + (track_data.track_evolution * current_lap / 10) # Divide by 10 to normalize
+        
+        # Basic features
+        columns = [
+            data['current_position'],
+            data['gap_ahead'],
+            data['gap_behind'], 
+            track_data.overtaking_diff,
+            track_data.safety_car_prob, 
+            track_data.total_laps - current_lap,  # remaining laps
+            tire_age,
+            track_data.track_evolution,
+            track_data.tire_deg_factor
+        ]
+        
+        # Engineered features
+        columns.extend([
+            # Tire compound characteristics
+            grip_level,
+            deg_rate,
+            tire_age / max_life,  # Tire life percentage (normalized)
+            
+            # Race progress features
+            current_lap / track_data.total_laps,  # Race progress (normalized)
+            evolution_factor,  # Track evolution effect
+            
+            # Track type encoding
+            *TRACK_TYPE_ENCODING.get(track_data.track_type, (0.0, 0.0, 0.0)),
+            
+            # Combined characteristics
+            track_data.tire_deg_factor * track_data.track_evolution,
+            track_data.overtaking_diff * track_data.safety_car_prob,
+            deg_rate * track_data.tire_deg_factor,  # Combined tire degradation
+            
+            # Strategy indicators
+            1.0 if track_data.overtaking_diff < 0.3 else 0.0,  # Easy overtaking
+            1.0 if track_data.safety_car_prob > 0.35 else 0.0,  # High SC risk
+            current_lap < track_data.total_laps * 0.3,  # Early race
+            current_lap > track_data.total_laps * 0.7   # Late race
+        ])
+        
+        # Fill a single (n_samples, n_features) matrix, broadcasting scalar columns
+        features = np.empty((n_samples, len(columns)), dtype=np.float64)
+        for i, column in enumerate(columns):
+            features[:, i] = column
+        return features
+    
+    def _standardize(self, X: np.ndarray) -> np.ndarray:
+        """Scale features in place to zero mean and unit variance using training statistics."""
+        X -= self.feature_mean
+        X /= self.feature_scale
+        return X
     
     def train(self, historical_data: List[Dict]):
         """Train the pit window prediction model."""
-        X = np.array([self.prepare_features(data)[0] for data in historical_data])
-        y = np.array([data['optimal_pit_lap'] for data in historical_data])
+        # Build the full (n_samples, n_features) matrix in a single allocation
+        X = np.array([self._feature_row(data) for data in historical_data], dtype=np.float64)
+        y = np.fromiter((data['optimal_pit_lap'] for data in historical_data),
+                        dtype=np.float64, count=len(historical_data))
+        self._fit(X, y)
+    
+    def train_columns(self, historical_data: Dict):
+        """
+        Train the pit window prediction model from column-oriented data.
         
-        self.scaler.fit(X)
-        X_scaled = self.scaler.transform(X)
+        Args:
+            historical_data: Same keys as predict_window's race_data, each holding
+                one value per sample (track_data is shared by all samples), plus
+                'optimal_pit_lap'
+        """
+        X = self._feature_matrix(historical_data)
+        y = np.asarray(historical_data['optimal_pit_lap'])
+        self._fit(X, y)
+    
+    def _fit(self, X: np.ndarray, y: np.ndarray):
+        """Fit standardization statistics and the model on a raw feature matrix."""
+        # Standardize with NumPy directly; constant features keep a scale of 1
+        self.feature_mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        self.feature_scale = scale
+        X_scaled = self._standardize(X)
+        if self.model is None:
+            self.model = self._build_model()
         self.model.fit(X_scaled, y)
         self.is_trained = True
     
-    def predict_window(self, race_data: Dict) -> Tuple[int, int]:
+    def predict_window(self, race_data: Dict) -> PitWindow:
         """
         Predict optimal pit window based on current race situation.
         
@@ -196,46 +367,95 @@ class PitWindowPredictor:
                 - compound: str (optional, defaults to 'MEDIUM')
         
         Returns:
-            Tuple of (window_start, window_end) in laps
+            PitWindow of (start, end) laps
         """
         if not self.is_trained:
             # Fallback to heuristic-based prediction if model isn't trained
             return self._heuristic_prediction(race_data)
         
         features = self.prepare_features(race_data)
-        optimal_lap = int(self.model.predict(features)[0])
+        # Predict through the fitted booster to skip the sklearn wrapper's input validation
+        optimal_lap = int(self.model.booster_.predict(features)[0])
+        return self._window_around(race_data, optimal_lap)
+    
+    def predict_windows(self, scenarios: List[Dict]) -> List[PitWindow]:
+        """
+        Predict optimal pit windows for several race situations at once.
+        
+        Scenarios on the same track are stacked into columns, so features and
+        window bounds are computed with array operations, and all situations
+        are scored with a single model call.
+        
+        Args:
+            scenarios: List of race_data dictionaries, as accepted by predict_window
+        
+        Returns:
+            List of PitWindow (start, end) laps, one per scenario
+        """
+        if not self.is_trained:
+            # Fallback to heuristic-based prediction if model isn't trained
+            return [self._heuristic_prediction(race_data) for race_data in scenarios]
+        if not scenarios:
+            return []
         
+        # Group scenarios by track; each group shares one TrackData in _feature_matrix
+        groups = {}
+        for i, race_data in enumerate(scenarios):
+            groups.setdefault(race_data['track_data'], []).append(i)
+        
+        order, blocks, window_sizes, first_laps, last_laps = [], [], [], [], []
+        for track_data, indices in groups.items():
+            group = [scenarios[i] for i in indices]
+            columns = {field: np.array([race_data[field] for race_data in group]) for field in RACE_FIELDS}
+            columns['compound'] = np.array([race_data.get('compound', 'MEDIUM') for race_data in group])
+            columns['track_data'] = track_data
+            
+            order.extend(indices)
+            blocks.append(self._feature_matrix(columns))
+            window_sizes.append(self._window_sizes(track_data, columns['compound']))
+            first_laps.append(columns['current_lap'] + 1)
+            last_laps.append(np.full(len(indices), track_data.total_laps - 1))
+        
+        features = self._standardize(np.vstack(blocks))
+        # Predict through the fitted booster to skip the sklearn wrapper's input validation
+        optimal_laps = self.model.booster_.predict(features).astype(np.int64)
+        
+        # Window bounds for every scenario at once, scattered back to input order
+        window_size = np.concatenate(window_sizes)
+        window_start = np.empty(len(scenarios), dtype=np.int64)
+        window_end = np.empty(len(scenarios), dtype=np.int64)
+        window_start[order] = np.maximum(np.concatenate(first_laps), optimal_laps - window_size)
+        window_end[order] = np.minimum(np.concatenate(last_laps), optimal_laps + window_size)
+        
+        return list(map(PitWindow._make, zip(window_start.tolist(), window_end.tolist())))
+    
+    def _window_sizes(self, track_data: TrackData, compounds: np.ndarray) -> np.ndarray:
+        """Window sizes as in _window_around, for several compounds on one track."""
+        window_size = np.maximum(2, PIT_WINDOW_SIZE.get(track_data.track_type, 3)
+                                 + COMPOUND_WINDOW_OFFSET[compound_indices(compounds)])
+        return window_size + int(track_data.overtaking_diff < 0.3) + int(track_data.safety_car_prob > 0.35)
+    
+    def _window_around(self, race_data: Dict, optimal_lap: int) -> PitWindow:
+        """Build the pit window around a predicted optimal lap."""
         # Adjust window based on track characteristics
         track_data = race_data['track_data']
         compound = race_data.get('compound', 'MEDIUM')
-        tire_info = TIRE_COMPOUNDS[compound]
         
-        # Base window size depends on track type and tire compound
-        if track_data.track_type == 'High-speed':
-            window_size = 4  # Wider windows due to overtaking opportunities
-        elif track_data.track_type == 'Street':
-            window_size = 2  # Narrow windows due to track position importance
-        else:
-            window_size = 3  # Balanced window for technical tracks
-        
-        # Adjust window based on tire compound
-        if compound == 'SOFT':
-            window_size = max(2, window_size - 1)  # Narrower window for softs
-        elif compound == 'HARD':
-            window_size += 1  # Wider window for hards
-        
-        # Further adjust based on track characteristics
-        if track_data.overtaking_diff < 0.3:
-            window_size += 1  # Easier overtaking allows wider windows
-        if track_data.safety_car_prob > 0.35:
-            window_size += 1  # High SC probability suggests flexible windows
+        # Base window size depends on track type and tire compound (at least 2 laps)
+        window_size = max(2, PIT_WINDOW_SIZE.get(track_data.track_type, 3)
+                          + COMPOUND_WINDOW_ADJUSTMENT[compound])
+        
+        # Further adjust based on track characteristics: easier overtaking and
+        # high SC probability each widen the window by one lap (int() so numpy
+        # bools from live data add up instead of OR-ing together)
+        window_size += int(track_data.overtaking_diff < 0.3) + int(track_data.safety_car_prob > 0.35)
         
         window_start = max(race_data['current_lap'] + 1, optimal_lap - window_size)
         window_end = min(track_data.total_laps - 1, optimal_lap + window_size)
         
-        return window_start, window_end
+        return PitWindow(window_start, window_end)
     
-    def _heuristic_prediction(self, race_data: Dict) -> Tuple[int, int]:
+    def _heuristic_prediction(self, race_data: Dict) -> PitWindow:
         """Fallback heuristic-based prediction when model isn't trained."""
         track_data = race_data['track_data']
         current_lap = race_data['current_lap']
@@ -249,12 +469,7 @@ class PitWindowPredictor:
         base_window = int(base_window * (1 / track_data.tire_deg_factor))
         
         # Add evolution bonus
-        if track_data.track_evolution >= 0.09:
-            base_window += 3
-        elif track_data.track_evolution >= 0.08:
-            base_window += 2
-        else:
-            base_window += 1
+        base_window += evolution_bonus(track_data.track_evolution)
         
         # Calculate optimal pit lap
         optimal_lap = current_lap + (base_window - tire_age)
@@ -274,7 +489,7 @@ class PitWindowPredictor:
         window_start = max(current_lap + 1, optimal_lap - window_size)
         window_end = min(track_data.total_laps - 1, optimal_lap + window_size)
         
-        return window_start, window_end
+        return PitWindow(window_start, window_end)
 
 class TrackPredictor:
     """Track characteristics predictor using historical data and ML."""
@@ -294,6 +509,10 @@ class TrackPredictor:
             total_laps=track_data['total_laps']
         )
     
-    def predict_pit_window(self, race_data: Dict) -> Tuple[int, int]:
+    def predict_pit_window(self, race_data: Dict) -> PitWindow:
         """Predict optimal pit window using ML model."""
         return self.pit_window_predictor.predict_window(race_data)
+    
+    def predict_pit_windows(self, scenarios: List[Dict]) -> List[PitWindow]:
+        """Predict optimal pit windows for several race situations in one model call."""
+        return self.pit_window_predictor.predict_windows(scenarios)
@@ -2,34 +2,14 @@
 Pit stop strategy analyzer for F1 races.
 """
 import fastf1
+import functools
 import logging
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS, TRACK_NAME_LOOKUP, TIRE_COMPOUNDS
 import numpy as np
 
-# Constants for tire compounds and effects
-TIRE_COMPOUNDS = {
-    'SOFT': {
-        'max_life': 20,
-        'deg_rate': 1.3,
-        'grip_level': 1.0,
-        'optimal_temp': 90
-    },
-    'MEDIUM': {
-        'max_life': 30,
-        'deg_rate': 1.0,
-        'grip_level': 0.85,
-        'optimal_temp': 85
-    },
-    'HARD': {
-        'max_life': 40,
-        'deg_rate': 0.8,
-        'grip_level': 0.7,
-        'optimal_temp': 80
-    }
-}
-
 # Fuel load effects on tire degradation
 FUEL_EFFECTS = {
     'initial_weight': 110,  # kg of fuel at start
@@ -43,6 +23,44 @@ FUEL_EFFECTS = {
     }
 }
 
+# FastF1 on-disk cache, resolved from the project root so it does not depend on the working directory
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'cache'
+
+_cache_enabled = False
+
+def enable_cache():
+    """Enable the FastF1 on-disk cache, creating its directory on first use only."""
+    global _cache_enabled
+    if not _cache_enabled:
+        CACHE_DIR.mkdir(exist_ok=True)
+        fastf1.Cache.enable_cache(str(CACHE_DIR))
+        _cache_enabled = True
+
+# Loaded sessions hold full lap, telemetry and weather data, so keep only a few in memory
+SESSION_CACHE_SIZE = 4
+
+@functools.lru_cache(maxsize=SESSION_CACHE_SIZE)
+def load_session(year: int, track_name: str, session_type: str = 'R'):
+    """
+    Load a FastF1 session, memoized on (year, track_name, session_type).
+    
+    Repeated requests for the same session reuse the already loaded object
+    instead of re-running session.load(). The returned session is shared
+    between callers and should be treated as read-only.
+    
+    Args:
+        year: Year of the event
+        track_name: Name of the track
+        session_type: Session identifier (e.g. 'R' for race)
+    
+    Returns:
+        Loaded fastf1 Session object
+    """
+    enable_cache()
+    session = fastf1.get_session(year, track_name, session_type)
+    session.load()
+    return session
+
 class PitStopAnalyzer:
     """
     Analyzes pit stop strategies based on track characteristics and tire compounds.
@@ -65,26 +83,36 @@ class PitStopAnalyzer:
         
         Args:
             year: Year of the race
-            track_name: Name of the track
+            track_name: Name of the track (case-insensitive)
+        
+        Raises:
+            ValueError: If the track has no historical characteristics
         """
+        # Resolve the track before the (slow) session load so unknown names fail fast
+        canonical_name = TRACK_NAME_LOOKUP.get(track_name.strip().lower())
+        if canonical_name is None:
+            raise ValueError(f"Unknown track '{track_name}', expected one of: "
+                             f"{', '.join(TRACK_CHARACTERISTICS)}")
+        
         try:
-            self.session = fastf1.get_session(year, track_name, 'R')
-            self.session.load()
-            self.track_data = self.track_predictor.predict(self.session)
+            self.session = load_session(year, canonical_name, 'R')
+            self.track_data = self.track_predictor.predict_from_characteristics(
+                TRACK_CHARACTERISTICS[canonical_name])
         except Exception as e:
             logging.error(f"Error loading race data: {str(e)}")
             raise
     
-    def calculate_fuel_effect(self, lap_number: int, compound: str) -> float:
+    def calculate_fuel_effect(self, lap_number: Union[int, np.ndarray],
+                              compound: str) -> Union[float, np.ndarray]:
         """
         Calculate the effect of fuel load on tire performance using exponential decay.
         
         Args:
-            lap_number: Current lap number
+            lap_number: Current lap number, or an array of lap numbers
             compound: Tire compound (SOFT, MEDIUM, HARD)
         
         Returns:
-            float: Adjustment factor for tire performance
+            Adjustment factor for tire performance, one per lap if an array was given
         """
         # Calculate remaining fuel using exponential decay
         initial_effect = 1.0  # Maximum effect at race start
@@ -98,7 +126,7 @@ class PitStopAnalyzer:
         fuel_factor = initial_effect * np.exp(-lap_number * adjusted_rate)
         
         # Ensure fuel factor stays within reasonable bounds
-        fuel_factor = max(0, min(1.0, fuel_factor))
+        fuel_factor = np.clip(fuel_factor, 0.0, 1.0)
         
         # Calculate compound-specific fuel effect
         base_deg = TIRE_COMPOUNDS[compound]['deg_rate']
@@ -151,7 +179,8 @@ class PitStopAnalyzer:
         Returns:
             Dict containing strategy recommendations
         """
-        if not self.track_data:
+        track_data = self.track_data
+        if not track_data:
             raise ValueError("Track data not loaded. Call load_race_data first.")
         
         strategy = {
@@ -163,7 +192,7 @@ class PitStopAnalyzer:
         
         # Early race strategy
         if race_laps >= 40:  # Still early in the race
-            if self.track_data.track_evolution >= 0.08:
+            if track_data.track_evolution >= 0.08:
                 strategy['tire_choices'].append('MEDIUM')
                 strategy['risks'].append('Higher initial degradation')
                 strategy['opportunities'].append('Track evolution benefit')
@@ -173,16 +202,16 @@ class PitStopAnalyzer:
                 strategy['opportunities'].append('Strategic flexibility')
         
         # Mid race strategy
-        if self.track_data.tire_deg_factor > 1.25:
+        if track_data.tire_deg_factor > 1.25:
             strategy['tire_choices'].append('HARD')
             strategy['risks'].append('High track degradation')
-        elif self.track_data.safety_car_prob > 0.35:
+        elif track_data.safety_car_prob > 0.35:
             strategy['tire_choices'].extend(['MEDIUM', 'SOFT'])
             strategy['opportunities'].append('Safety car opportunity')
         
         # Late race strategy
         if race_laps <= 20:
-            if self.track_data.overtaking_difficulty < 0.4:
+            if track_data.overtaking_diff < 0.4:
                 strategy['tire_choices'].append('SOFT')
                 strategy['opportunities'].append('Overtaking potential')
             else:
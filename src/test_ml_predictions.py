@@ -1,21 +1,24 @@
 """
 Test script to compare ML predictions with baseline track configurations.
 """
-from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS, TRACK_TYPE_DATA
+from models.track_model import TrackPredictor, TRACK_CHARACTERISTICS, TRACK_DATA, TRACK_NAME_LOOKUP, TRACK_TYPE_DATA, evolution_bonus
 from pitstop_analyzer import PitStopAnalyzer, TIRE_COMPOUNDS, FUEL_EFFECTS
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Plots are only saved to file, no GUI backend needed
 import matplotlib.pyplot as plt
+import copy
 import logging
-from typing import Dict, Any, List
+import pickle
+from pathlib import Path
+from typing import Dict, Any
+
+# Project root, where generated plots are saved
+ROOT = Path(__file__).resolve().parent.parent
 
 def normalize_track_name(track_name: str) -> str:
     """Normalize track name for consistent lookup."""
-    track_map = {
-        'monza': 'Monza',
-        'spa': 'Spa',
-        'silverstone': 'Silverstone'
-    }
-    return track_map.get(track_name.lower(), track_name)
+    return TRACK_NAME_LOOKUP.get(track_name.lower(), track_name)
 
 def test_fuel_effects(track_name: str):
     """Test and visualize fuel effects on tire degradation."""
@@ -27,17 +30,15 @@ def test_fuel_effects(track_name: str):
     # Initialize analyzers
     predictor = TrackPredictor()
     analyzer = PitStopAnalyzer(predictor)
-    analyzer.track_data = predictor.predict_from_characteristics(TRACK_CHARACTERISTICS[track_name])
+    analyzer.track_data = TRACK_DATA[track_name]
     
-    # Test fuel effects across laps
-    laps = range(0, 50)
+    # Test fuel effects across laps, one vectorized call per compound
+    laps = np.arange(0, 50)
     compounds = list(TIRE_COMPOUNDS.keys())  # Use compounds from constants
-    fuel_effects = {compound: [] for compound in compounds}
-    
-    for lap in laps:
-        for compound in compounds:
-            effect = analyzer.calculate_fuel_effect(lap, compound)
-            fuel_effects[compound].append(effect)
+    fuel_effects = {
+        compound: analyzer.calculate_fuel_effect(laps, compound)
+        for compound in compounds
+    }
     
     # Plot fuel effects with consistent compound case
     plt.figure(figsize=(12, 8))
@@ -77,95 +78,95 @@ def test_fuel_effects(track_name: str):
     # Adjust tick parameters for better visibility
     plt.tick_params(axis='both', colors='white', labelsize=10)
     
-    plt.savefig('fuel_effects.png', 
+    plt.savefig(ROOT / 'fuel_effects.png', 
                 facecolor='#1C1C1C',
                 edgecolor='none',
                 bbox_inches='tight',
-                dpi=300)
+                dpi=300,
+                pil_kwargs={'compress_level': 3})  # Faster PNG encode at 300 dpi
     plt.close()
     
-    # Print analysis
-    print(f"\nFuel Effect Analysis for {track_name}")
-    print("=" * 50)
+    # Print analysis, built up and written in a single call
+    lines = [f"\nFuel Effect Analysis for {track_name}", "=" * 50]
     
     for compound in compounds:
         initial_effect = fuel_effects[compound][0]
         mid_effect = fuel_effects[compound][25]
         final_effect = fuel_effects[compound][-1]
         
-        print(f"\n{compound.capitalize()} Compound:")
-        print(f"Initial degradation multiplier: {initial_effect:.3f}")
-        print(f"Mid-race degradation multiplier: {mid_effect:.3f}")
-        print(f"End-race degradation multiplier: {final_effect:.3f}")
-        print(f"Total effect reduction: {((initial_effect - final_effect) / initial_effect) * 100:.1f}%")
+        lines.extend([
+            f"\n{compound.capitalize()} Compound:",
+            f"Initial degradation multiplier: {initial_effect:.3f}",
+            f"Mid-race degradation multiplier: {mid_effect:.3f}",
+            f"End-race degradation multiplier: {final_effect:.3f}",
+            f"Total effect reduction: {((initial_effect - final_effect) / initial_effect) * 100:.1f}%"
+        ])
+    
+    print("\n".join(lines))
 
 def create_test_race_data(track_name: str) -> Dict:
     """Create test race data for predictions."""
-    track_data = TRACK_CHARACTERISTICS[track_name]
     return {
         'current_position': 5,  # Mid-field position
         'gap_ahead': 2.5,      # Typical gap in seconds
         'gap_behind': 1.8,     # Typical gap in seconds
-        'track_data': TrackPredictor().predict_from_characteristics(track_data),
+        'track_data': TRACK_DATA[track_name],
         'current_lap': 15,     # Early-mid race
         'tire_age': 8,         # Mid-stint tire age
         'compound': 'MEDIUM'   # Default to medium compound
     }
 
-def create_historical_data(track_name: str, n_samples: int = 500) -> List[Dict]:
-    """Create synthetic historical data for training."""
+def create_historical_data(track_name: str, n_samples: int = 500) -> Dict[str, Any]:
+    """Create synthetic historical data for training, stored as one array per field."""
     track_data = TRACK_CHARACTERISTICS[track_name]
-    track_obj = TrackPredictor().predict_from_characteristics(track_data)
+    track_obj = TRACK_DATA[track_name]
     
-    historical_data = []
     compounds = [str(c) for c in TIRE_COMPOUNDS.keys()]  # Convert to regular Python strings
     
-    for _ in range(n_samples):
-        # Randomize race situations
-        position = np.random.randint(1, 20)
-        gap_ahead = np.random.uniform(0.5, 4.0)
-        gap_behind = np.random.uniform(0.5, 4.0)
-        current_lap = np.random.randint(10, 40)
-        tire_age = np.random.randint(5, 20)
-        compound = str(np.random.choice(compounds))  # Convert numpy string to Python string
-        
-        # Calculate optimal pit lap based on track characteristics
-        base_window = TIRE_COMPOUNDS[compound]['max_life']
-        base_window = int(base_window * (1 / track_data['tire_deg_factor']))
-        
-        # Add evolution bonus
-        if track_data['track_evolution'] >= 0.09:
-            base_window += 3
-        elif track_data['track_evolution'] >= 0.08:
-            base_window += 2
-        else:
-            base_window += 1
-        
-        # Add some noise to optimal lap
-        optimal_lap = current_lap + (base_window - tire_age)
-        optimal_lap += np.random.randint(-2, 3)  # Add noise
-        
-        # Ensure optimal lap is within race distance
-        optimal_lap = max(current_lap + 1, min(optimal_lap, track_data['total_laps'] - 5))
-        
-        # Consider tire degradation
-        if track_data['tire_deg_factor'] > 1.25:
-            optimal_lap = max(current_lap + 1, optimal_lap - 2)  # Earlier stops for high deg
-        
-        # Consider track evolution
-        if track_data['track_evolution'] >= 0.09:
-            optimal_lap = min(track_data['total_laps'] - 5, optimal_lap + 1)  # Later stops possible
-        
-        historical_data.append({
-            'current_position': position,
-            'gap_ahead': gap_ahead,
-            'gap_behind': gap_behind,
-            'track_data': track_obj,
-            'current_lap': current_lap,
-            'tire_age': tire_age,
-            'compound': compound,
-            'optimal_pit_lap': optimal_lap
-        })
+    # Evolution bonus depends only on the track, so compute it once
+    evo_bonus = evolution_bonus(track_data['track_evolution'])
+    
+    # Base window per compound based on track characteristics
+    base_windows = np.array([
+        int(TIRE_COMPOUNDS[compound]['max_life'] * (1 / track_data['tire_deg_factor'])) + evo_bonus
+        for compound in compounds
+    ], dtype=np.int16)
+    
+    # Randomize all race situations at once, using compact dtypes
+    # (laps and positions fit in int16, gaps in float32)
+    positions = np.random.randint(1, 20, size=n_samples, dtype=np.int16)
+    gaps_ahead = np.random.uniform(0.5, 4.0, size=n_samples).astype(np.float32)
+    gaps_behind = np.random.uniform(0.5, 4.0, size=n_samples).astype(np.float32)
+    current_laps = np.random.randint(10, 40, size=n_samples, dtype=np.int16)
+    tire_ages = np.random.randint(5, 20, size=n_samples, dtype=np.int16)
+    compound_idx = np.random.randint(0, len(compounds), size=n_samples, dtype=np.int8)
+    
+    # Add some noise to optimal lap
+    optimal_laps = current_laps + (base_windows[compound_idx] - tire_ages)
+    optimal_laps += np.random.randint(-2, 3, size=n_samples, dtype=np.int16)  # Add noise
+    
+    # Ensure optimal lap is within race distance
+    optimal_laps = np.maximum(current_laps + 1, np.minimum(optimal_laps, track_data['total_laps'] - 5))
+    
+    # Consider tire degradation
+    if track_data['tire_deg_factor'] > 1.25:
+        optimal_laps = np.maximum(current_laps + 1, optimal_laps - 2)  # Earlier stops for high deg
+    
+    # Consider track evolution
+    if track_data['track_evolution'] >= 0.09:
+        optimal_laps = np.minimum(track_data['total_laps'] - 5, optimal_laps + 1)  # Later stops possible
+    
+    # Column-oriented samples: one array per field, shared track data
+    historical_data = {
+        'current_position': positions,
+        'gap_ahead': gaps_ahead,
+        'gap_behind': gaps_behind,
+        'track_data': track_obj,
+        'current_lap': current_laps,
+        'tire_age': tire_ages,
+        'compound': np.array(compounds)[compound_idx],
+        'optimal_pit_lap': optimal_laps
+    }
     
     return historical_data
 
@@ -234,17 +235,20 @@ def test_ml_predictions(track_name: str):
     # Create historical data and train model
     print("\nTraining ML model...")
     historical_data = create_historical_data(track_name)
-    predictor.pit_window_predictor.train(historical_data)
+    predictor.pit_window_predictor.train_columns(historical_data)
     
     # Test predictions for each compound
     print("\nTesting predictions...")
     test_data = create_test_race_data(track_name)
     
-    for compound in TIRE_COMPOUNDS.keys():
-        test_data['compound'] = compound
-        window_start, window_end = predictor.predict_pit_window(test_data)
-        
-        print(f"\n{compound.capitalize()} compound prediction for lap {test_data['current_lap']}:")
+    compounds = list(TIRE_COMPOUNDS.keys())
+    windows = predictor.predict_pit_windows([
+        {**test_data, 'compound': compound} for compound in compounds
+    ])
+    
+    current_lap = test_data['current_lap']
+    for compound, (window_start, window_end) in zip(compounds, windows):
+        print(f"\n{compound.capitalize()} compound prediction for lap {current_lap}:")
         print(f"Window Start: Lap {window_start}")
         print(f"Window End: Lap {window_end}")
         print(f"Window Size: {window_end - window_start} laps")
@@ -269,6 +273,13 @@ def test_ml_predictions(track_name: str):
         print("- Conservative pit windows")
         print("- Safety car probability high - stay flexible")
 
+def test_track_data_copies():
+    """Check that the shared TrackData instances survive pickle and copy round trips (run with pytest)."""
+    for track_data in TRACK_DATA.values():
+        assert pickle.loads(pickle.dumps(track_data)) == track_data
+        assert copy.copy(track_data) == track_data
+        assert copy.deepcopy(track_data) == track_data
+
 def main():
     """Test ML predictions for all tracks."""
     logging.basicConfig(level=logging.INFO)